@@ -4,17 +4,33 @@ from google import genai
 from google.genai import types
 import json
 import time 
+import threading
+import offline
 load_dotenv()
 API_KEY = os.getenv("GEMINI_API_KEY")
+
+# Offline mode: forced by VIETRX_OFFLINE=1, implied when no API key is configured.
+OFFLINE_MODE = os.getenv("VIETRX_OFFLINE", "").lower() in ("1", "true", "yes")
+REMOTE_TIMEOUT_S = float(os.getenv("VIETRX_REMOTE_TIMEOUT", "12"))  # Latency budget for Generate + Audit
+REMOTE_COOLDOWN_S = 60.0  # Skip the remote path for a while after it fails or times out
+
+SYSTEM_ERROR_MESSAGE = "Xin lỗi ạ, hệ thống đang gặp sự cố."
+
 if not API_KEY:
-    raise ValueError("GEMINI_API_KEY is not set")
+    print("[WARNING] GEMINI_API_KEY is not set. Running in offline mode.")
+    client = None
+else:
+    client = genai.Client(api_key=API_KEY)
+
+_remote_down_until = 0.0
 
-client = genai.Client(api_key=API_KEY)
 def call_gemini_with_retry(prompt,
                            model="gemini-2.5-flash",
                            max_retries=3,
                            base_delay=2.0,
                            **config_kwargs):
+    if client is None:
+        return None
                                
     for attempt in range(1, max_retries + 1):
         try:
@@ -146,7 +162,7 @@ def get_medical_advice(user_input, drug_info):
     draft = generate_draft_advice(user_input, drug_info)
     
     if not draft:
-        return "Xin lỗi ạ, hệ thống đang gặp sự cố."
+        return SYSTEM_ERROR_MESSAGE
 
     print(f"[AI PIPELINE] 2. Auditing for safety...")
     audit_result = audit_safety(drug_info, draft)
@@ -163,3 +179,39 @@ def get_medical_advice(user_input, drug_info):
             return correction
         else:
             return "Xin lỗi ạ, thông tin thuốc phức tạp con cần kiểm tra lại ạ."
+
+
+def remote_available():
+    """True when the Gemini path is configured and not in its failure cooldown."""
+    return client is not None and not OFFLINE_MODE and time.monotonic() >= _remote_down_until
+
+
+def get_advice(user_input, drug_info, drug_record=None, metadata=None, timeout=REMOTE_TIMEOUT_S):
+    """
+    PIPELINE with fallback: Remote (Generate -> Audit) within `timeout` seconds,
+    otherwise local template advice from the offline module.
+    Returns: (advice_text, source) where source is "remote" or "offline".
+    """
+    global _remote_down_until
+
+    if remote_available():
+        result = {}
+
+        def worker():
+            result["advice"] = get_medical_advice(user_input, drug_info)
+
+        # Daemon thread: a hung network call must not block the answer or interpreter exit
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        thread.join(timeout)
+
+        advice = result.get("advice")
+        if advice and advice != SYSTEM_ERROR_MESSAGE:
+            return advice, "remote"
+
+        reason = "timed out" if thread.is_alive() else "failed"
+        print(f"[FALLBACK] Remote pipeline {reason}. Using offline advice for {REMOTE_COOLDOWN_S:.0f}s.")
+        _remote_down_until = time.monotonic() + REMOTE_COOLDOWN_S
+
+    print("[AI PIPELINE] Building offline template advice...")
+    return offline.build_offline_advice(drug_record, metadata), "offline"
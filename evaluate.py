@@ -0,0 +1,289 @@
+"""
+VietRx Evaluation Harness: Measures recognition accuracy versus latency.
+Replays a labeled dataset (images or recorded video) through vision + entity linking.
+
+Dataset layout:
+    dataset/
+    ├── labels.csv        # file,drug_name,strength,expiry
+    ├── box_01.jpg
+    └── shelf_scan.mp4    # Every --frame-step-th frame is scored against its row
+
+Usage:
+    python evaluate.py dataset/
+    python evaluate.py dataset/ --sweep conf=0.3,0.4,0.5 padding=5,20 link=0.4,0.6 fda=0.8,0.9
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import re
+import statistics
+import time
+
+import cv2
+
+import knowledge
+import normalize
+import vision
+
+LABELS_FILE = "labels.csv"
+VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv"}
+STAGES = ("detect", "ocr", "link", "total")
+
+# Tunables exposed to --sweep: name -> (default, type)
+TUNABLES = {
+    "conf": (vision.CONFIDENCE_THRESHOLD, float),    # YOLO confidence threshold
+    "padding": (vision.BOX_PADDING, int),            # Crop padding (px)
+    "link": (knowledge.LINK_THRESHOLD, float),       # Suggestion acceptance threshold
+    "fda": (knowledge.FDA_MATCH_THRESHOLD, float),   # RAG lookup acceptance threshold
+}
+
+def load_labels(dataset_dir):
+    """Reads labels.csv into a list of dicts (file, drug_name, strength, expiry)."""
+    path = os.path.join(dataset_dir, LABELS_FILE)
+    with open(path, newline='', encoding='utf-8') as f:
+        return [row for row in csv.DictReader(f) if row.get("file")]
+
+def iter_frames(path, frame_step):
+    """Yields BGR frames: one for an image, every frame_step-th frame for a video."""
+    if not os.path.exists(path):
+        return
+
+    if os.path.splitext(path)[1].lower() not in VIDEO_EXTENSIONS:
+        img = cv2.imread(path)
+        if img is None:
+            print(f"[ERROR] Could not read image: {path}")
+            return
+        yield img
+        return
+
+    cap = cv2.VideoCapture(path)
+    index = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if index % frame_step == 0:
+            yield frame
+        index += 1
+    cap.release()
+
+def same_name(predicted, expected):
+    return bool(predicted) and normalize.normalize_text(predicted) == normalize.normalize_text(expected)
+
+def same_strength(predicted, expected):
+    return re.sub(r'\s+', '', predicted or "").lower() == re.sub(r'\s+', '', expected or "").lower()
+
+def same_expiry(predicted, expected):
+    """Compares only the date part: 'EXP 12/27' matches '12/27'."""
+    found = re.search(r'\d+/\d+', predicted or "")
+    wanted = re.search(r'\d+/\d+', expected or "")
+    if not wanted:
+        return not found
+    return bool(found) and found.group(0) == wanted.group(0)
+
+def run_vision(dataset_dir, labels, conf, padding, frame_step):
+    """
+    Stage 1: OCR every sample once per vision configuration.
+    Returns: list of (label_row, raw_text, timings).
+    """
+    observations = []
+    for row in labels:
+        path = os.path.join(dataset_dir, row["file"])
+        frames_read = 0
+        for frame in iter_frames(path, frame_step):
+            timings = {}
+            raw_text = vision.analyze_frame(frame, conf_threshold=conf, box_padding=padding, timings=timings)
+            observations.append((row, raw_text, timings))
+            frames_read += 1
+
+        # Missing/unreadable files stay in the denominator as failed samples
+        if frames_read == 0:
+            print(f"[ERROR] No frames read for labeled sample: {path}")
+            observations.append((row, "", {"unreadable": True}))
+    return observations
+
+def link_observations(observations, top_k):
+    """
+    Stage 2: Entity linking + metadata extraction, once per vision configuration.
+    The ranking does not depend on the acceptance thresholds, so it is computed once here.
+    Latency times the production call (find_best_match, as in main.run_system), which
+    takes the exact-key early return and top-1 pruning; the top-k list used for
+    scoring is computed separately and not timed.
+    Returns: list of (label_row, raw_text, timings, ranked, metadata).
+    """
+    linked = []
+    for row, raw_text, timings in observations:
+        if len(raw_text) <= 3:
+            linked.append((row, raw_text, dict(timings, link=0.0), [], knowledge.extract_label_metadata(raw_text)))
+            continue
+
+        start = time.perf_counter()
+        knowledge.find_best_match(raw_text, min_score=knowledge.LINK_THRESHOLD)
+        metadata = knowledge.extract_label_metadata(raw_text)
+        timings = dict(timings, link=time.perf_counter() - start)
+
+        ranked = knowledge.rank_matches(raw_text, limit=top_k)
+        linked.append((row, raw_text, timings, ranked, metadata))
+    return linked
+
+def score_observations(linked, link_threshold, fda_threshold, top_k):
+    """
+    Stage 3: Applies the acceptance thresholds and scores against the labels.
+    A wrong accept is a DB name shown to the user (link) or sent to the LLM (fda)
+    that is not the labeled drug; raising a threshold trades coverage for fewer of these.
+    """
+    hits = {"top1": 0, "topk": 0, "strength": 0, "expiry": 0}
+    gates = {gate: {"accepted": 0, "correct": 0} for gate in ("link", "fda")}
+    latencies = {stage: [] for stage in STAGES}
+
+    for row, raw_text, timings, ranked, metadata in linked:
+        # Unreadable samples only count in the denominator: no hits, no latency
+        if timings.get("unreadable"):
+            continue
+
+        top_drug, top_score = ranked[0] if ranked else (None, 0.0)
+        top_correct = top_drug is not None and same_name(top_drug['brand_name'], row["drug_name"])
+
+        # Same acceptance rule as main.run_system
+        prediction = raw_text
+        if top_score > link_threshold:
+            prediction = top_drug['brand_name']
+            gates["link"]["accepted"] += 1
+            gates["link"]["correct"] += top_correct
+
+        # RAG gate (knowledge.lookup_fda), applied here to the raw OCR text without human confirmation
+        if top_drug is not None and top_score >= fda_threshold:
+            gates["fda"]["accepted"] += 1
+            gates["fda"]["correct"] += top_correct
+
+        hits["top1"] += same_name(prediction, row["drug_name"])
+        hits["topk"] += any(same_name(drug['brand_name'], row["drug_name"]) for drug, _ in ranked)
+        hits["strength"] += same_strength(metadata["strength"] if metadata["strength"] != "N/A" else "", row.get("strength"))
+        hits["expiry"] += same_expiry(metadata["expiry"] if metadata["expiry"] != "N/A" else "", row.get("expiry"))
+
+        for stage in ("detect", "ocr", "link"):
+            latencies[stage].append(timings.get(stage, 0.0))
+        latencies["total"].append(sum(timings.get(stage, 0.0) for stage in ("detect", "ocr", "link")))
+
+    total = len(linked) or 1
+    report = {
+        "samples": len(linked),
+        "unreadable": sum(1 for _, _, timings, _, _ in linked if timings.get("unreadable")),
+        "top1_accuracy": hits["top1"] / total,
+        f"top{top_k}_accuracy": hits["topk"] / total,
+        "strength_accuracy": hits["strength"] / total,
+        "expiry_accuracy": hits["expiry"] / total,
+        "latency_ms": {},
+    }
+    for gate, counts in gates.items():
+        accepted, correct = counts["accepted"], counts["correct"]
+        report[f"{gate}_coverage"] = accepted / total
+        report[f"{gate}_precision"] = correct / accepted if accepted else 1.0
+        report[f"{gate}_wrong_accept_rate"] = (accepted - correct) / total
+    for stage, values in latencies.items():
+        values = sorted(values) or [0.0]
+        report["latency_ms"][stage] = {
+            "mean": 1000 * statistics.fmean(values),
+            "p50": 1000 * values[len(values) // 2],
+            "p95": 1000 * values[min(len(values) - 1, int(0.95 * len(values)))],
+        }
+    return report
+
+def parse_sweep(specs):
+    """Turns ['conf=0.3,0.4', 'link=0.5'] into a grid over every tunable."""
+    grid = {name: [default] for name, (default, _) in TUNABLES.items()}
+    for spec in specs or []:
+        name, sep, values = spec.partition("=")
+        if name not in TUNABLES:
+            raise ValueError(f"Unknown tunable '{name}'. Choose from: {', '.join(TUNABLES)}")
+        cast = TUNABLES[name][1]
+        grid[name] = [cast(v) for v in values.split(",") if v]
+        if not sep or not grid[name]:
+            raise ValueError(f"Tunable '{name}' needs at least one value, e.g. {name}={TUNABLES[name][0]}")
+    names = list(grid)
+    return [dict(zip(names, combo)) for combo in itertools.product(*(grid[n] for n in names))]
+
+def objectives(report):
+    """Pareto axes, all to be minimized: missed names, wrong accepts, latency."""
+    return (
+        1.0 - report["top1_accuracy"],
+        report["link_wrong_accept_rate"] + report["fda_wrong_accept_rate"],
+        report["latency_ms"]["total"]["mean"],
+    )
+
+def pareto_front(results):
+    """Configurations not dominated on (top-1 accuracy, wrong-accept rate, mean total latency)."""
+    front = []
+    for r in results:
+        mine = objectives(r)
+        dominated = False
+        for o in results:
+            theirs = objectives(o)
+            if all(t <= m for t, m in zip(theirs, mine)) and theirs != mine:
+                dominated = True
+                break
+        if not dominated:
+            front.append(r)
+    return front
+
+def evaluate(dataset_dir, configs, top_k=3, frame_step=15):
+    """Runs every configuration; vision and ranking are reused across threshold-only changes."""
+    labels = load_labels(dataset_dir)
+    print(f"[INFO] Loaded {len(labels)} labeled samples from '{dataset_dir}'")
+
+    linked_cache = {}
+    results = []
+    for config in configs:
+        vision_key = (config["conf"], config["padding"])
+        if vision_key not in linked_cache:
+            print(f"[STATUS] Running vision: conf={config['conf']} padding={config['padding']}")
+            observations = run_vision(dataset_dir, labels, config["conf"], config["padding"], frame_step)
+            linked_cache[vision_key] = link_observations(observations, top_k)
+        report = score_observations(linked_cache[vision_key], config["link"], config["fda"], top_k)
+        report["config"] = config
+        results.append(report)
+    return results
+
+def print_report(results, top_k):
+    front = pareto_front(results)
+    print("\n[REPORT] Accuracy vs Latency")
+    print(f"{'conf':>6} {'pad':>4} {'link':>5} {'fda':>5} | {'top1':>6} {'top'+str(top_k):>6} {'str':>6} {'exp':>6} | "
+          f"{'l.cov':>6} {'l.prec':>6} {'l.bad':>6} {'f.cov':>6} {'f.prec':>6} {'f.bad':>6} | "
+          f"{'detect':>8} {'ocr':>8} {'link':>8} {'total':>8} {'p95':>8}")
+    for r in results:
+        c, lat = r["config"], r["latency_ms"]
+        marker = " *" if r in front else ""
+        print(f"{c['conf']:>6.2f} {c['padding']:>4} {c['link']:>5.2f} {c['fda']:>5.2f} | "
+              f"{r['top1_accuracy']:>6.1%} {r[f'top{top_k}_accuracy']:>6.1%} "
+              f"{r['strength_accuracy']:>6.1%} {r['expiry_accuracy']:>6.1%} | "
+              f"{r['link_coverage']:>6.1%} {r['link_precision']:>6.1%} {r['link_wrong_accept_rate']:>6.1%} "
+              f"{r['fda_coverage']:>6.1%} {r['fda_precision']:>6.1%} {r['fda_wrong_accept_rate']:>6.1%} | "
+              f"{lat['detect']['mean']:>7.1f}ms {lat['ocr']['mean']:>7.1f}ms "
+              f"{lat['link']['mean']:>7.1f}ms {lat['total']['mean']:>7.1f}ms {lat['total']['p95']:>7.1f}ms{marker}")
+    print("(cov = share of samples accepted, prec = correct among accepted, bad = wrong accepts per sample)")
+    print("(* = Pareto-optimal on top-1 accuracy, wrong-accept rate and latency)")
+    if results and results[0]["unreadable"]:
+        print(f"[WARNING] {results[0]['unreadable']} labeled sample(s) were missing or unreadable and count as failures.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate VietRx recognition accuracy vs latency.")
+    parser.add_argument("dataset", help="Directory containing labels.csv and images/videos")
+    parser.add_argument("--sweep", nargs="*", default=[], help="Tunable grid, e.g. conf=0.3,0.4 padding=5,20 link=0.4,0.6 fda=0.8,0.9")
+    parser.add_argument("--top-k", type=int, default=3, help="k for top-k drug-name accuracy")
+    parser.add_argument("--frame-step", type=int, default=15, help="Score every n-th frame of videos")
+    parser.add_argument("--output", help="Optional path to save the full JSON report")
+    args = parser.parse_args()
+
+    results = evaluate(args.dataset, parse_sweep(args.sweep), top_k=args.top_k, frame_step=args.frame_step)
+    print_report(results, args.top_k)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"results": results, "pareto_front": pareto_front(results)}, f, indent=4, ensure_ascii=False)
+        print(f"[INFO] Report saved to '{args.output}'")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
 import json
 import os
+import re
 import difflib
+import normalize
 
 DB_FILE = "fda_database.json"
 
+# Matcher thresholds (similarity ratio [0.0 - 1.0])
+FDA_MATCH_THRESHOLD = 0.85  # Strict: used for the RAG lookup
+LINK_THRESHOLD = 0.4        # Lenient: used to suggest a name for user confirmation
+SUBSTRING_SCORE = 0.95      # Boost when a DB name appears inside the OCR text
+
 def load_database():
     if not os.path.exists(DB_FILE):
         return []
@@ -12,38 +19,153 @@ def load_database():
 
 DRUG_DB = load_database()
 
-def search_fda(text_input):
+# Precomputed once at import: O(1) exact-key lookup + skeletons for fuzzy scoring
+SKELETON_INDEX, PHONETIC_INDEX, MAX_NAME_WORDS = normalize.build_key_index(DRUG_DB)
+# Each entry: (skeleton with numbers for substring checks, skeleton without for ratios, record)
+DRUG_SKELETONS = [
+    (normalize.skeleton_key(drug['brand_name'], keep_numbers=True), normalize.skeleton_key(drug['brand_name']), drug)
+    for drug in DRUG_DB
+]
+DRUG_SKELETON_BY_ID = {id(drug): (full, plain) for full, plain, drug in DRUG_SKELETONS}
+
+def lookup_keys(text_input):
     """
-    Performs a fuzzy search on the local FDA database.
-    Returns: Formatted string of drug details or None.
+    Probes the precomputed key indexes without scanning the database.
+    Returns: (exact, candidates). exact is the record for an unambiguous skeleton-key
+    hit, or None. candidates are records from phonetic hits or from skeleton keys
+    shared by different names; they are only hints for fuzzy scoring and never
+    count as a match on their own.
+    """
+    candidates = []
+    for skel, phon in normalize.candidate_keys(text_input, MAX_NAME_WORDS):
+        records = SKELETON_INDEX.get(skel, [])
+        # Same brand from several labelers is one name; different names need fuzzy scoring
+        if records and len({drug['brand_name'].lower() for drug in records}) == 1:
+            return records[0], candidates
+        for drug in records + PHONETIC_INDEX.get(phon, []):
+            if not any(drug is seen for seen in candidates):
+                candidates.append(drug)
+    return None, candidates
+
+def lookup_exact(text_input):
+    """
+    Resolves a normalized exact-key hit without scanning the database.
+    Returns: The matching drug record or None.
+    """
+    exact, _ = lookup_keys(text_input)
+    return exact
+
+def rank_matches(text_input, limit=1, min_score=0.0):
+    """
+    Ranks database records against noisy OCR text.
+    Only a skeleton-key hit scores 1.0 outright; phonetic candidates are fuzzy-scored
+    first so they raise the pruning bar early, then the rest of the DB is scanned.
+    Returns: List of (record, score) sorted by descending score.
+    """
+    if not DRUG_DB or not text_input:
+        return []
+
+    exact, candidates = lookup_keys(text_input)
+    if exact is not None and limit == 1:
+        return [(exact, 1.0)]
+
+    query = normalize.skeleton_key(text_input)
+    query_full = normalize.skeleton_key(text_input, keep_numbers=True)
+    if not query_full:
+        return []
+
+    scored = []
+    bar = min_score  # For top-1 queries the bar rises with the best score so far
+    matcher = difflib.SequenceMatcher()
+    matcher.set_seq2(query)
+    candidate_ids = {id(drug) for drug in candidates}
+    entries = [DRUG_SKELETON_BY_ID[id(drug)] + (drug,) for drug in candidates]
+    entries += [entry for entry in DRUG_SKELETONS if id(entry[2]) not in candidate_ids]
+    for full, skel, drug in entries:
+        if drug is exact:
+            continue
+        # Boost Heuristic: substring membership (e.g. OCR="Bexarotene Capsules USP").
+        # Numbers are kept here so 'U-500' on the label cannot boost 'U-100'.
+        if len(full) >= normalize.MIN_KEY_LENGTH and full in query_full:
+            scored.append((drug, SUBSTRING_SCORE))
+            if limit == 1:
+                bar = max(bar, SUBSTRING_SCORE)
+            continue
+        if not skel:
+            continue
+        matcher.set_seq1(skel)
+        # quick_ratio() is a cheap upper bound; skip records that cannot qualify
+        if matcher.quick_ratio() < bar:
+            continue
+        score = matcher.ratio()
+        if score >= bar:
+            scored.append((drug, score))
+            if limit == 1:
+                bar = score
+
+    scored.sort(key=lambda item: item[1], reverse=True)
+    if exact is not None:
+        scored.insert(0, (exact, 1.0))
+    return scored[:limit]
+
+def find_best_match(text_input, min_score=FDA_MATCH_THRESHOLD):
+    """
+    Returns: (record, score) for the best candidate above min_score, or (None, 0.0).
+    """
+    matches = rank_matches(text_input, limit=1, min_score=min_score)
+    if matches:
+        return matches[0]
+    return None, 0.0
+
+def extract_label_metadata(text):
+    """
+    Heuristic Extraction: Targeted Regex for medical units on the label.
+    Returns: dict with 'strength', 'quantity', 'expiry' ("N/A" when absent).
+    """
+    metadata = {"strength": "N/A", "quantity": "N/A", "expiry": "N/A"}
+    if not text:
+        return metadata
+
+    # Dosage Strength (mg, ml, mcg, g)
+    s_match = re.search(r'(\d+(?:[.,]\d+)?)\s*(mg|ml|mcg|g)\b', text, re.I)
+    if s_match: metadata["strength"] = s_match.group(0)
+
+    # Packaging Quantity (tablets, capsules, etc.)
+    q_match = re.search(r'(\d+)\s*(capsules|tablets|pills|vien)', text, re.I)
+    if q_match: metadata["quantity"] = q_match.group(0)
+
+    # Expiry Date Detection (EXP, HSD formats)
+    e_match = re.search(r'(EXP|HSD|Expiry)[\s:]*(\d+/\d+)', text, re.I)
+    if e_match: metadata["expiry"] = e_match.group(0)
+
+    return metadata
+
+def lookup_fda(text_input):
+    """
+    Performs a normalized exact-key lookup, then a fuzzy search on the local FDA database.
+    Returns: (record, formatted context string); record is None when nothing matches.
     """
     if not DRUG_DB:
-        return "Error: Database file not found. Please run mining.py first."
-
-    text_input = text_input.lower().strip()
-    best_match = None
-    highest_score = 0
-    
-    for drug in DRUG_DB:
-        # Calculate string similarity ratio
-        score = difflib.SequenceMatcher(None, drug['id'], text_input).ratio()
-        
-        # Boost score if exact match found
-        if drug['id'] in text_input: 
-            score = 1.0
-            
-        if score > 0.85 and score > highest_score:
-            highest_score = score
-            best_match = drug
+        return None, "Error: Database file not found. Please run mining.py first."
+
+    best_match, _ = find_best_match(text_input, min_score=FDA_MATCH_THRESHOLD)
 
     if best_match:
         print(f"[RAG SYSTEM] Found match in FDA DB: {best_match['brand_name']}")
         # Return formatted context for the AI
-        return f"""
+        return best_match, f"""
         Brand Name: {best_match['brand_name']}
         Active Ingredient: {best_match['generic_name']}
         Pharmacological Class (English): {best_match['pharm_class']}
         Data Source: FDA USA
         """
-    
-    return "Drug not found in FDA database."
+
+    return None, "Drug not found in FDA database."
+
+def search_fda(text_input):
+    """
+    Performs a fuzzy search on the local FDA database.
+    Returns: Formatted string of drug details or None.
+    """
+    _, context = lookup_fda(text_input)
+    return context
@@ -1,12 +1,14 @@
 import vision
 import knowledge
 import brain
+import offline
 import os
 import platform
 import re
-import difflib
 from gtts import gTTS
 
+GTTS_TIMEOUT_S = 5.0  # Seconds before switching to local TTS
+
 def clean_text_for_audio(text):
     """
     Utility: Sanitizes the generated text for optimal Speech Synthesis.
@@ -16,26 +18,42 @@ def clean_text_for_audio(text):
     text = re.sub(r'\s+', ' ', text).strip()
     return text
 
-def play_audio(text):
+def play_file(filename):
     """
     Executes cross-platform audio playback using OS-level commands.
     Handlers: 'start' (Windows), 'afplay' (macOS), 'xdg-open' (Linux).
     """
+    if platform.system() == "Windows":
+        os.system(f'start {filename}')
+    elif platform.system() == "Darwin": 
+        os.system(f'afplay {filename}')
+    else: # Linux
+        os.system(f'xdg-open {filename}')
+
+def play_audio(text, allow_online=True):
+    """
+    Synthesizes speech with Google TTS (gTTS), falling back to the local
+    offline engine when the network is unavailable or offline mode is on.
+    Pass allow_online=False (e.g. after an offline advice fallback) to skip gTTS.
+    """
     print("[INFO] Synthesizing speech audio (TTS)...")
+    clean_response = clean_text_for_audio(text)
+
+    if allow_online and not brain.OFFLINE_MODE:
+        try:
+            # Google TTS (gTTS) API call, bounded so a slow network cannot stall playback
+            tts = gTTS(text=clean_response, lang='vi', timeout=GTTS_TIMEOUT_S)
+            filename = "advice.mp3"
+            tts.save(filename)
+            play_file(filename)
+            return
+        except Exception as e:
+            print(f"[WARNING] Online TTS failed: {e}. Switching to local TTS.")
+
     try:
-        clean_response = clean_text_for_audio(text)
-        # Google TTS (gTTS) API call
-        tts = gTTS(text=clean_response, lang='vi')
-        filename = "advice.mp3"
-        tts.save(filename)
-        
-        # Execute system command for playback
-        if platform.system() == "Windows":
-            os.system(f'start {filename}')
-        elif platform.system() == "Darwin": 
-            os.system(f'afplay {filename}')
-        else: # Linux
-            os.system(f'xdg-open {filename}')
+        filename = offline.synthesize_speech(clean_response)
+        if filename:
+            play_file(filename)
     except Exception as e:
         print(f"[ERROR] Audio playback failed: {e}")
 
@@ -61,40 +79,33 @@ def run_system():
     # -------------------------------------------------------------------------
     # PHASE 2: POST-OCR ERROR CORRECTION (ENTITY LINKING)
     # -------------------------------------------------------------------------
-    # Algorithm: Fuzzy String Matching (Levenshtein Distance)
+    # Algorithm: Normalized exact-key lookup, then Fuzzy String Matching
     # Objective: Map noisy OCR output to the nearest valid entity in Ground Truth.
     # -------------------------------------------------------------------------
 
-    database_ref = knowledge.DRUG_DB  # Reference to in-memory database
+    # Normalization folds diacritics, dose/packaging tokens ("100mg", "Tabs")
+    # and OCR confusables (0/O, 1/l/I, rn/m) before any scoring happens.
+    # Heuristic: Only attempt correction if OCR signal is sufficient (>3 chars)
     best_candidate = raw_ocr_text     # Default fallback
     highest_confidence_score = 0.0
-    CONFIDENCE_THRESHOLD = 0.4        # Minimum similarity ratio for acceptance
-
-    # Heuristic: Only attempt correction if OCR signal is sufficient (>3 chars)
-    if len(raw_ocr_text) > 3 and database_ref:
-        for record in database_ref:
-            target_name = record['brand_name']
-            
-            # Compute similarity ratio [0.0 - 1.0]
-            similarity_score = difflib.SequenceMatcher(None, target_name.lower(), raw_ocr_text.lower()).ratio()
-            
-            # Boost Heuristic: Assign high confidence if target is a substring
-            # This handles cases like: OCR="100mg Bexarotene Tabs" -> Target="Bexarotene"
-            if target_name.lower() in raw_ocr_text.lower():
-                similarity_score = 0.95 
-            
-            # Greedy Selection: Keep the candidate with the highest global score
-            if similarity_score > highest_confidence_score:
-                highest_confidence_score = similarity_score
-                best_candidate = target_name
+    if len(raw_ocr_text) > 3:
+        record, highest_confidence_score = knowledge.find_best_match(
+            raw_ocr_text, min_score=knowledge.LINK_THRESHOLD
+        )
+        if record:
+            best_candidate = record['brand_name']
 
     # Determine final suggestion based on threshold logic
-    final_suggestion = best_candidate if highest_confidence_score > CONFIDENCE_THRESHOLD else raw_ocr_text
+    final_suggestion = best_candidate if highest_confidence_score > knowledge.LINK_THRESHOLD else raw_ocr_text
     
     # Log raw data for debugging/audit
     print(f"[OCR RAW] Signal: '{raw_ocr_text}'")
     print(f"[ENTITY LINKING] Candidate: '{final_suggestion}' | Score: {highest_confidence_score:.4f}")
 
+    # Label metadata (strength, quantity, expiry) for the advice context
+    label_meta = knowledge.extract_label_metadata(raw_ocr_text)
+    print(f"[INFO] Strength: {label_meta['strength']} | Quantity: {label_meta['quantity']} | Exp: {label_meta['expiry']}")
+
     # -------------------------------------------------------------------------
     # PHASE 3: HUMAN-IN-THE-LOOP VERIFICATION
     # -------------------------------------------------------------------------
@@ -111,13 +122,15 @@ def run_system():
     # PHASE 4: RETRIEVAL-AUGMENTED GENERATION (RAG)
     # -------------------------------------------------------------------------
     print(f"[RAG] Querying FDA Knowledge Base for: '{drug_name}'")
-    fda_info = knowledge.search_fda(drug_name)
+    drug_record, fda_info = knowledge.lookup_fda(drug_name)
     
     # -------------------------------------------------------------------------
     # PHASE 5: DUAL-LLM REASONING & AUDIT
     # -------------------------------------------------------------------------
+    # Falls back to offline template advice if Gemini is slow or unavailable.
     print("[LLM] Generating medical advice with Auditor validation...")
-    advice = brain.get_medical_advice(drug_name, fda_info)
+    advice, source = brain.get_advice(drug_name, fda_info, drug_record=drug_record, metadata=label_meta)
+    print(f"[INFO] Advice source: {source}")
     
     # -------------------------------------------------------------------------
     # PHASE 6: OUTPUT & ACCESSIBILITY
@@ -128,7 +141,7 @@ def run_system():
     print(final_output)
     print("") # End of stream
     
-    play_audio(final_output)
+    play_audio(final_output, allow_online=(source == "remote"))
 
 if __name__ == "__main__":
     run_system()
@@ -0,0 +1,157 @@
+"""
+VietRx Normalization Module: Cleans noisy OCR text before entity linking.
+Pipeline: Diacritic folding -> Dose/packaging stripping -> Confusable folding -> Keys
+"""
+
+import re
+import unicodedata
+
+# Dosage tokens such as "100mg", "0.5 ml", "20 mcg", "5%"
+DOSE_PATTERN = re.compile(r'\b\d+(?:[.,]\d+)?\s*(?:mg|mcg|ug|ml|g|kg|iu|ui|%)(?![a-z])', re.I)
+
+# Packaging / route words that never belong to a brand name (English + Vietnamese)
+PACKAGING_WORDS = {
+    "tab", "tabs", "tablet", "tablets",
+    "cap", "caps", "capsule", "capsules",
+    "pill", "pills", "softgel", "softgels",
+    "oral", "use", "usp", "rx", "only", "exp",
+    "vien", "nang", "hop", "vi", "goi", "chai", "thuoc", "uong",
+}
+
+# Multi-character OCR confusions (applied before single characters)
+CONFUSABLE_SEQUENCES = [
+    ("rn", "m"),
+    ("vv", "w"),
+    ("cl", "d"),
+]
+
+# Single-character OCR confusions: each group collapses onto one symbol
+CONFUSABLE_CHARS = str.maketrans({
+    "0": "o",
+    "1": "l", "i": "l", "|": "l", "!": "l",
+    "5": "s",
+    "8": "b",
+})
+
+# Phonetic rewrites (order matters: digraphs first)
+PHONETIC_RULES = [
+    ("ph", "f"),
+    ("th", "t"),
+    ("ch", "k"),
+    ("ck", "k"),
+    ("qu", "k"),
+    ("x", "ks"),
+]
+PHONETIC_CHARS = str.maketrans({"c": "k", "q": "k", "z": "s", "y": "l", "w": "v"})
+VOWELS = set("aeiou")
+
+MIN_KEY_LENGTH = 4  # Shorter keys are too ambiguous for an exact-hit shortcut
+
+
+def strip_diacritics(text):
+    """Removes Vietnamese/Latin diacritics: 'Viên nang' -> 'Vien nang'."""
+    text = text.replace("đ", "d").replace("Đ", "D")
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def normalize_text(text, keep_numbers=False):
+    """
+    Produces the canonical, human-readable form of a label string.
+    Example: '100mg Bexarotene Tabs' -> 'bexarotene'
+    keep_numbers=True keeps bare number tokens, which tell apart DB names
+    like 'Humulin R U-100' and 'Humulin R U-500'.
+    """
+    if not text:
+        return ""
+    text = strip_diacritics(text).lower()
+    text = DOSE_PATTERN.sub(" ", text)
+    text = re.sub(r"[^a-z0-9|! ]+", " ", text)
+
+    tokens = []
+    for token in text.split():
+        # Pure numbers are counts/lot codes, not part of a drug name
+        if (token.isdigit() and not keep_numbers) or token in PACKAGING_WORDS:
+            continue
+        tokens.append(token)
+    return " ".join(tokens)
+
+
+def skeleton_key(text, keep_numbers=False):
+    """
+    Collapses OCR-confusable glyphs onto a shared shape.
+    'B0XAR0TENE' and 'Bexarotene' differ only where OCR actually failed.
+    """
+    return fold_confusables(normalize_text(text, keep_numbers))
+
+
+def fold_confusables(normalized):
+    """Skeleton of text that has already been through normalize_text()."""
+    key = normalized.replace(" ", "")
+    for src, dst in CONFUSABLE_SEQUENCES:
+        key = key.replace(src, dst)
+    return key.translate(CONFUSABLE_CHARS)
+
+
+def phonetic_key(text):
+    """
+    Coarse sound-alike key built on top of the skeleton:
+    keeps the first letter, drops remaining vowels and doubled letters.
+    """
+    return phonetic_from_skeleton(skeleton_key(text))
+
+
+def phonetic_from_skeleton(key):
+    """Phonetic key of an existing skeleton (avoids re-normalizing)."""
+    if not key:
+        return ""
+    for src, dst in PHONETIC_RULES:
+        key = key.replace(src, dst)
+    key = key.translate(PHONETIC_CHARS)
+
+    out = [key[0]]
+    for ch in key[1:]:
+        if ch in VOWELS or ch == out[-1]:
+            continue
+        out.append(ch)
+    return "".join(out)
+
+
+def candidate_keys(text, max_words):
+    """
+    Yields (skeleton, phonetic) pairs for word n-grams, longest first,
+    so extra label words like 'Capsules USP' do not prevent an exact hit.
+    The text is normalized once and n-grams are capped at max_words
+    (the longest indexed name), keeping long OCR dumps linear in length.
+    Number tokens are kept so 'U-500' can hit its own key; shorter n-grams
+    without them still cover counts and lot numbers around the name.
+    """
+    words = normalize_text(text, keep_numbers=True).split()
+    for size in range(min(len(words), max_words), 0, -1):
+        for start in range(len(words) - size + 1):
+            skel = fold_confusables(" ".join(words[start:start + size]))
+            yield skel, phonetic_from_skeleton(skel)
+
+
+def build_key_index(records, field="brand_name"):
+    """
+    Precomputes exact-match lookup tables for the drug database.
+    Returns: (skeleton_index, phonetic_index, max_words) where both indexes map
+    key -> list of records and max_words is the longest normalized name in words.
+    Names keep their number tokens so strength variants get distinct keys;
+    records that still share a key are all kept for the caller to disambiguate.
+    """
+    skeleton_index = {}
+    phonetic_index = {}
+    max_words = 0
+    for record in records:
+        normalized = normalize_text(record.get(field) or "", keep_numbers=True)
+        skel = fold_confusables(normalized)
+        if len(skel) >= MIN_KEY_LENGTH:
+            skeleton_index.setdefault(skel, []).append(record)
+            max_words = max(max_words, len(normalized.split()))
+        phon = phonetic_from_skeleton(skel)
+        if len(phon) >= MIN_KEY_LENGTH:
+            phonetic_index.setdefault(phon, []).append(record)
+            max_words = max(max_words, len(normalized.split()))
+    return skeleton_index, phonetic_index, max_words
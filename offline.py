@@ -0,0 +1,130 @@
+"""
+VietRx Offline Module: Local advice templates and text-to-speech.
+Used when the Gemini API is unavailable, too slow, or GEMINI_API_KEY is not set.
+"""
+
+# Optional dependency: pyttsx3 drives the OS speech engine (SAPI5 / NSSpeech / eSpeak)
+try:
+    import pyttsx3
+except ImportError:
+    pyttsx3 = None
+
+# Plain-Vietnamese guidance keyed by FDA Established Pharmacologic Class (EPC) strings.
+# Entry: (keywords, exclusions, template). A class matches when it contains a keyword
+# and none of the exclusions. Checked in order, so more specific classes come first.
+# This text is never audited, so it must not assume a route (oral, topical, injection):
+# say "dùng" (use), never "uống" (swallow), and avoid meal timing or dose instructions.
+CLASS_TEMPLATES = [
+    (("nonsteroidal anti-inflammatory",), (),
+     "Đây là thuốc giảm đau, kháng viêm không steroid. Bà không dùng chung với thuốc giảm đau khác "
+     "khi chưa hỏi bác sĩ, và báo bác sĩ nếu bị đau bụng hoặc đi ngoài phân đen."),
+    (("opioid agonist",), ("antagonist",),
+     "Đây là thuốc giảm đau mạnh, có thể gây buồn ngủ và gây nghiện. "
+     "Bà chỉ dùng đúng liều bác sĩ kê, không uống rượu bia và không tự ý tăng liều."),
+    (("antibacterial", "antimicrobial"), (),
+     "Đây là thuốc kháng sinh. Bà cần dùng đủ số ngày bác sĩ dặn, kể cả khi đã thấy khỏe, "
+     "và báo ngay cho bác sĩ nếu bị nổi mẩn hoặc khó thở."),
+    (("hmg-coa reductase inhibitor",), (),
+     "Đây là thuốc giảm mỡ máu. Bà dùng đều đặn theo đơn và báo bác sĩ nếu bị đau cơ bất thường."),
+    (("angiotensin converting enzyme inhibitor", "angiotensin 2 receptor blocker",
+      "beta-adrenergic blocker", "calcium channel blocker", "thiazide diuretic", "loop diuretic"), (),
+     "Đây là thuốc huyết áp hoặc tim mạch. Bà dùng đều đặn theo đơn, không tự ý ngưng thuốc, "
+     "và đứng dậy từ từ để tránh chóng mặt."),
+    (("biguanide", "sulfonylurea", "insulin", "dipeptidyl peptidase 4 inhibitor", "glp-1 receptor agonist"), (),
+     "Đây là thuốc tiểu đường. Bà báo bác sĩ nếu thấy run tay, vã mồ hôi "
+     "hoặc chóng mặt vì có thể bị hạ đường huyết."),
+    (("anticoagulant", "vitamin k antagonist", "factor xa inhibitor", "direct thrombin inhibitor",
+      "platelet aggregation inhibitor"), (),
+     "Đây là thuốc chống đông máu. Bà cần báo bác sĩ nếu thấy chảy máu bất thường "
+     "và không tự ý dùng thêm thuốc giảm đau."),
+    (("corticosteroid",), (),
+     "Đây là thuốc kháng viêm loại corticoid. Bà dùng đúng cách và đúng thời gian bác sĩ dặn, "
+     "không tự ý dùng kéo dài hay ngưng đột ngột."),
+    (("proton pump inhibitor", "histamine-2 receptor antagonist"), (),
+     "Đây là thuốc giảm tiết axit dạ dày. Bà dùng đúng giờ theo hướng dẫn của bác sĩ."),
+    (("histamine-1 receptor antagonist",), (),
+     "Đây là thuốc chống dị ứng. Thuốc có thể gây buồn ngủ, bà tránh lái xe sau khi dùng."),
+    (("retinoid",), (),
+     "Đây là thuốc đặc biệt thuộc nhóm retinoid. Bà cần tái khám đúng hẹn "
+     "và tránh nắng trong thời gian dùng thuốc."),
+    (("kinase inhibitor", "alkylating drug"), (),
+     "Đây là thuốc điều trị ung thư. Bà phải dùng đúng chỉ định của bác sĩ chuyên khoa "
+     "và tái khám đúng hẹn."),
+]
+
+DEFAULT_TEMPLATE = "Bà nhớ dùng thuốc đúng liều lượng và cách dùng theo hướng dẫn của bác sĩ nhé."
+
+UNKNOWN_DRUG_ADVICE = (
+    "Dạ thưa ạ, con chưa tìm thấy thông tin thuốc này trong dữ liệu FDA. "
+    "Bà vui lòng hỏi dược sĩ hoặc bác sĩ trước khi dùng ạ."
+)
+
+CLOSING = "Nếu thấy khó chịu bất thường, bà hỏi ngay dược sĩ hoặc bác sĩ ạ."
+
+def select_template(pharm_class):
+    """
+    Picks the class guidance whose keyword appears in the FDA pharm_class string.
+    Hyphens are ignored on both sides ('beta-Adrenergic' vs 'beta adrenergic').
+    """
+    def fold(text):
+        return text.lower().replace("-", " ")
+
+    pharm_class = fold(pharm_class or "")
+    for keywords, exclusions, template in CLASS_TEMPLATES:
+        if any(fold(keyword) in pharm_class for keyword in keywords) and \
+                not any(fold(exclusion) in pharm_class for exclusion in exclusions):
+            return template
+    return DEFAULT_TEMPLATE
+
+def build_offline_advice(drug_record, metadata=None):
+    """
+    Builds plain-Vietnamese advice from the template library without any network call.
+    Args:
+        drug_record: FDA record dict (brand_name, generic_name, pharm_class) or None.
+        metadata: Optional label fields from knowledge.extract_label_metadata().
+    Returns:
+        str: Advice text ready for speech synthesis.
+    """
+    if not drug_record:
+        return UNKNOWN_DRUG_ADVICE
+
+    metadata = metadata or {}
+    parts = [f"Dạ thưa ạ, thuốc {drug_record['brand_name']} có hoạt chất {drug_record['generic_name']}."]
+
+    strength = metadata.get("strength", "N/A")
+    quantity = metadata.get("quantity", "N/A")
+    if strength != "N/A":
+        parts.append(f"Hàm lượng ghi trên hộp là {strength}.")
+    if quantity != "N/A":
+        parts.append(f"Hộp có {quantity}.")
+
+    parts.append(select_template(drug_record.get("pharm_class")))
+
+    expiry = metadata.get("expiry", "N/A")
+    if expiry != "N/A":
+        parts.append(f"Hạn sử dụng: {expiry}, bà không dùng thuốc đã hết hạn nhé.")
+
+    parts.append(CLOSING)
+    return " ".join(parts)
+
+def synthesize_speech(text, filename="advice.wav"):
+    """
+    Local TTS backend (no network). Prefers an installed Vietnamese voice.
+    Returns: The written filename, or None if no local engine is available.
+    """
+    if pyttsx3 is None:
+        print("[WARNING] pyttsx3 is not installed. Local speech unavailable.")
+        return None
+
+    engine = pyttsx3.init()
+    for voice in engine.getProperty('voices'):
+        languages = [
+            (lang.decode(errors="ignore") if isinstance(lang, bytes) else str(lang)).strip("\x05").lower()
+            for lang in (voice.languages or [])
+        ]
+        if "vietnam" in (voice.name or "").lower() or any(lang.startswith("vi") for lang in languages):
+            engine.setProperty('voice', voice.id)
+            break
+    engine.save_to_file(text, filename)
+    engine.runAndWait()
+    return filename
@@ -3,10 +3,12 @@ import easyocr
 import cv2
 import numpy as np
 import os
+import time
 
 # CONFIGURATION
 MODEL_PATH = "best.pt"  # Custom trained model
 CONFIDENCE_THRESHOLD = 0.4
+BOX_PADDING = 5  # Margin (px) around each box so OCR sees the full text
 
 print("[INFO] Initializing Vision System...")
 
@@ -50,8 +52,31 @@ def analyze_image(image_path):
         print(f"[ERROR] Could not read image: {image_path}")
         return ""
 
+    return analyze_frame(img)
+
+def analyze_frame(img, conf_threshold=None, box_padding=None, timings=None):
+    """
+    Runs the Detect -> Crop -> OCR pipeline on an in-memory BGR image.
+    Args:
+        conf_threshold: YOLO confidence override (defaults to CONFIDENCE_THRESHOLD).
+        box_padding: Crop padding override (defaults to BOX_PADDING).
+        timings: Optional dict; 'detect' and 'ocr' seconds are added to it.
+    Returns: The detected drug name string (best guess).
+    """
+    if detector is None or reader is None or img is None:
+        return ""
+
+    conf_threshold = CONFIDENCE_THRESHOLD if conf_threshold is None else conf_threshold
+    pad = BOX_PADDING if box_padding is None else box_padding
+    if timings is None:
+        timings = {}
+    timings.setdefault("detect", 0.0)
+    timings.setdefault("ocr", 0.0)
+
     # Step 1: Object Detection
-    results = detector(img, conf=CONFIDENCE_THRESHOLD, verbose=False)
+    start = time.perf_counter()
+    results = detector(img, conf=conf_threshold, verbose=False)
+    timings["detect"] += time.perf_counter() - start
 
     best_text = ""
     best_score = 0.0
@@ -64,7 +89,6 @@ def analyze_image(image_path):
 
             # Step 2: Image Cropping (with padding)
             h, w, _ = img.shape
-            pad = 5
             x1 = max(0, x1 - pad)
             y1 = max(0, y1 - pad)
             x2 = min(w, x2 + pad)
@@ -72,8 +96,10 @@ def analyze_image(image_path):
             crop_img = img[y1:y2, x1:x2]
 
             # Step 3: Text Recognition (OCR)
+            start = time.perf_counter()
             gray_crop = cv2.cvtColor(crop_img, cv2.COLOR_BGR2GRAY)
             ocr_result = reader.readtext(gray_crop, detail=0)
+            timings["ocr"] += time.perf_counter() - start
             text = " ".join(ocr_result).strip()
             if len(text) < 3:
                 continue
@@ -102,5 +128,7 @@ def analyze_image(image_path):
 
     # Fallback: Full image scan if YOLO misses
     print("[WARNING] No strong object match. Scanning full image...")
+    start = time.perf_counter()
     full_ocr = reader.readtext(img, detail=0)
+    timings["ocr"] += time.perf_counter() - start
     return " ".join(full_ocr).strip()